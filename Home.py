@@ -1,4 +1,5 @@
 # app.py
+import os
 import streamlit as st
 import requests
 from streamlit_lottie import st_lottie
@@ -10,27 +11,48 @@ st.set_page_config(page_title='Portfolio', layout="wide", page_icon='🌏')
 
 # ----------------- Load Assets ----------------- #
 
+@st.cache_resource
+def get_http_session():
+    # Streamlit re-executes this script on every rerun, so the session is kept
+    # as a cached resource to reuse its keep-alive connections
+    return requests.Session()
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def fetch_lottie(url: str):
+    # Failures (timeouts, bad status) raise so they aren't cached for a day;
+    # load_lottieurl handles them
+    r = get_http_session().get(url, timeout=5)
+    r.raise_for_status()
+    return r.json()
+
 def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
+    try:
+        return fetch_lottie(url)
+    except requests.RequestException:
         return None
-    return r.json()
 
-def load_css(file_name):
+def is_static_lottie(animation):
+    # A composition spanning a single frame looks identical when looped
+    if not animation:
+        return True
+    return animation.get("op", 0) - animation.get("ip", 0) <= 1
+
+@st.cache_data(show_spinner=False)
+def read_css(file_name, mtime):
+    # mtime is only part of the cache key, so edits to the file are picked up
     with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+        return f'<style>{f.read()}</style>'
+
+def load_css(file_name):
+    # The <style> block still has to be emitted on every rerun, otherwise
+    # Streamlit drops it from the page; only the file read is memoized
+    st.markdown(read_css(file_name, os.path.getmtime(file_name)), unsafe_allow_html=True)
 
 # Load custom CSS
 load_css("style/style.css")
 
-# Loading Lottie animations
+# Loading Lottie animations (skill badges are static icons in images/icons)
 lottie_intro = load_lottieurl("https://lottie.host/00517c35-de11-4d81-b606-f0b1e4427991/uexdHHLp7o.json")
-python_lottie = load_lottieurl("https://assets6.lottiefiles.com/packages/lf20_2znxgjyt.json")
-my_sql_lottie = load_lottieurl("https://assets4.lottiefiles.com/private_files/lf30_w11f2rwn.json")
-github_lottie = load_lottieurl("https://assets8.lottiefiles.com/packages/lf20_6HFXXE.json")
-docker_lottie = load_lottieurl("https://assets4.lottiefiles.com/private_files/lf30_35uv2spq.json")
-js_lottie = load_lottieurl("https://lottie.host/fc1ad1cd-012a-4da2-8a11-0f00da670fb9/GqPujskDlr.json")
-html_lottie = load_lottieurl("https://lottie.host/c1982bb5-54ce-492c-b573-a6734a86834e/kdHflDuLEF.json")
 # ----------------- Info ----------------- #
 
 # Assuming 'info' is a dictionary defined in 'constant.py' or similar
@@ -74,10 +96,11 @@ with st.container():
         # Use black background and white text
         gradient('black', 'black', f"Hi, I'm {full_name} 👋", info["Intro"])
         st.write("")  # Adds spacing
-        st.markdown(f'<p style="color:black;">{info["About"]}</p>', unsafe_allow_html=True)
+        st.html(f'<p style="color:black;">{info["About"]}</p>')
 
     with col2:
-        st_lottie(lottie_intro, height=200, key="intro")
+        if lottie_intro:
+            st_lottie(lottie_intro, height=200, key="intro", loop=not is_static_lottie(lottie_intro))
 
 
 # ----------------- Skill Sets ----------------- #
@@ -86,36 +109,36 @@ with st.container():
     st.subheader('⚒️ Skills')
     col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
     with col1:
-        st_lottie(python_lottie, height=70, width=70, key="python", speed=2.5)
+        st.image("images/icons/python.svg", width=70)
         st.markdown("**Python**")
     with col2:
-        st_lottie(my_sql_lottie, height=70, width=70, key="mysql", speed=2.5)
+        st.image("images/icons/mysql.svg", width=70)
         st.markdown("**MySQL**")
     with col3:
-        st_lottie(html_lottie, height=70, width=70, key="html", speed=1)
+        st.image("images/icons/html.svg", width=70)
         st.markdown("**HTML/CSS**")
 
     
     # Additional skills
     with col1:
-        st_lottie(github_lottie, height=50, width=50, key="github", speed=2.5)
+        st.image("images/icons/github.svg", width=50)
         st.markdown("**GitHub**")
     with col2:
-        st_lottie(docker_lottie, height=50, width=50, key="docker", speed=2.5)
+        st.image("images/icons/docker.svg", width=50)
         st.markdown("**Docker**")
     with col3:
-        st_lottie(js_lottie, height=50, width=50, key="js", speed=1)
+        st.image("images/icons/javascript.svg", width=50)
         st.markdown("**JavaScript**")
 
     # Additional Skills: ESRI Suite and Open Source Geospatial Tools
     with st.container():
         # First row for ESRI Suite
         st.subheader('🗺️ ESRI Suite')
-        st.write("ArcGIS Pro/Map, ArcGIS Online, ArcGIS Enterprise, Web AppBuilder/Experience Builder, StoryMaps, FieldMaps")
+        st.text("ArcGIS Pro/Map, ArcGIS Online, ArcGIS Enterprise, Web AppBuilder/Experience Builder, StoryMaps, FieldMaps")
 
         # Second row for Open Source Geospatial Tools
         st.subheader('🌍 Open Source Geospatial Tools/ Others')
-        st.write("PostGIS, GDAL, Postgresql, QGIS, GeoServer, Leaflet, Rasterio, Apache Sedona, Apache Airflow , GCP/BigQuery/Terraform")
+        st.text("PostGIS, GDAL, Postgresql, QGIS, GeoServer, Leaflet, Rasterio, Apache Sedona, Apache Airflow , GCP/BigQuery/Terraform")
 
 
 # ----------------- GIS Portfolio Section ----------------- #
@@ -136,6 +159,17 @@ def boxy_container(bg_color, content):
     ''', unsafe_allow_html=True)
 
 
+# Internal page links only: st.html strips target attributes, which is fine
+# for same-tab navigation
+interactive_maps_html = """
+<p>For a more interactive experience, explore my interactive map series:</p>
+<p><a href="/Hongkong_Real_Estate"><em>🔗 View Interactive Hong Kong Housing Map</em></a></p>
+<p><a href="/OvertureMap_POI"><em>🔗 Search All Real-World Entities Sourced By The Overture Places Data</em></a></p>
+<p><a href="/SevenEleven"><em>🔗 View Interactive Hong Kong 7-11 Stores Map</em></a></p>
+<p><a href="/Hongkong_Population_Distribution"><em>🔗 View HongKong Population Distribution in H3 Grid</em></a></p>
+<p><a href="/Foursquare_POI"><em>🔗 View HongKong Coffee Shops With Foursquare POI Data</em></a></p>
+"""
+
 with st.container():
     st.subheader('🌐 GIS Portfolio')
     st.write("""
@@ -144,42 +178,18 @@ with st.container():
 
     # Static GIS Maps Portfolio Section with Expander
     with st.expander('📊 Static GIS Maps Portfolio'):
-        st.write("""
+        st.markdown("""
         You can explore my static GIS maps by visiting the Google Site below:
-        """)
-        st.markdown(
-            """<a href="https://sites.google.com/view/map-portfolio" target="_blank"><em>🔗 Access my GIS Maps Portfolio on Google Site</em></a>""",
-            unsafe_allow_html=True
-        )
-        st.write("(Click on the link for a detailed view of my GIS maps.)")
+
+        <a href="https://sites.google.com/view/map-portfolio" target="_blank"><em>🔗 Access my GIS Maps Portfolio on Google Site</em></a>
+
+        (Click on the link for a detailed view of my GIS maps.)
+        """, unsafe_allow_html=True)
 
     # Interactive Map Section with Link to map.py
     st.subheader('🗺️ Interactive Maps')
-    st.write("""
-    For a more interactive experience, explore my interactive map series:
-    """)
-    st.markdown(
-        """<a href="/Hongkong_Real_Estate" target="_self"><em>🔗 View Interactive Hong Kong Housing Map</em></a>""",
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        """<a href="/OvertureMap_POI" target="_self"><em>🔗 Search All Real-World Entities Sourced By The Overture Places Data</em></a>""",
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        """<a href="/SevenEleven" target="_self"><em>🔗 View Interactive Hong Kong 7-11 Stores Map</em></a>""",
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        """<a href="/Hongkong_Population_Distribution" target="_self"><em>🔗 View HongKong Population Distribution in H3 Grid</em></a>""",
-        unsafe_allow_html=True
-    )
-
-    st.markdown(
-        """<a href="/Foursquare_POI" target="_self"><em>🔗 View HongKong Coffee Shops With Foursquare POI Data</em></a>""",
-        unsafe_allow_html=True
-    )
-    
+    st.html(interactive_maps_html)
+
     # Javascript Portfolio Site Section with Expander
     st.subheader('💻 Javascript Portfolio Site')
     st.write("""
@@ -187,14 +197,13 @@ with st.container():
     """)
 
     with st.expander('🛠️ Explore Javascript Projects'):
-        st.write("""
+        st.markdown("""
         You can explore my Javascript projects hosted on my portfolio site below:
-        """)
-        st.markdown(
-            """<a href="https://portfoliosite-production-ca19.up.railway.app/" target="_blank"><em>🔗 Visit My Javascript Portfolio Site</em></a>""",
-            unsafe_allow_html=True
-        )
-        st.write("(Click on the link to view my Javascript projects and web applications.)")
+
+        <a href="https://portfoliosite-production-ca19.up.railway.app/" target="_blank"><em>🔗 Visit My Javascript Portfolio Site</em></a>
+
+        (Click on the link to view my Javascript projects and web applications.)
+        """, unsafe_allow_html=True)
 
 
 
@@ -216,7 +225,6 @@ embed_rss = {
 }
 
 with st.container():
-    st.markdown("""""")
     st.subheader('✍️ Medium')
     st.write("""I recently started writing technical medium blogs to share my passion in the geospatial field. 
          I always have this philosophy: If I can "teach" better, I learn better. As a student of the game, I'm able to find extra
@@ -227,11 +235,11 @@ with st.container():
         with st.expander('Display my latest posts'):
             components.html(embed_rss['rss'], height=400)
 
-        st.markdown(
-            """<a href="https://medium.com/@calvinluozhengpei" target="_blank"><em>🔗 Access to my Medium Profile</em></a>""",
-            unsafe_allow_html=True
-        )
-        st.write("""(Click on the above link for a better view!)""")
+        st.markdown("""
+        <a href="https://medium.com/@calvinluozhengpei" target="_blank"><em>🔗 Access to my Medium Profile</em></a>
+
+        (Click on the above link for a better view!)
+        """, unsafe_allow_html=True)
 
 
 # ----------------- Contact Section ----------------- #
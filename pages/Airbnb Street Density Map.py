@@ -1,112 +1,149 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
-import duckdb
 import pandas as pd
 import pydeck as pdk
-import geopandas as gpd
 import requests
 import json 
 import math 
-import osmnx as ox 
-import time
-
-
-def connect_to_duckdb():
-    """
-    Connect to the DuckDB database and load the spatial extension.
-    Parameters:
-    - db_path (str): Path to the DuckDB database.
-    Returns:
-    - DuckDB connection object.
-    """
-    con=duckdb.connect(database = ":memory")
-    con.execute("INSTALL spatial;")
-    con.execute("LOAD spatial;")
-    con.execute('INSTALL h3 FROM community;')
-    con.execute('Load h3')
-    return con
 
 
+@st.cache_data(ttl=86400, show_spinner=False)
 def get_street_network(lat, lon, radius=1000, network_type="walk"):
     """
     Retrieve a street network from OSMnx, given a point and a radius (in meters),
     plus a network type ("walk", "drive", etc.).
     """
+    # osmnx pulls in networkx/scipy; only import it once a listing is selected
+    import osmnx as ox
     G = ox.graph_from_point((lat, lon), dist=radius, network_type=network_type)
     nodes_gdf, edges_gdf = ox.graph_to_gdfs(G)
     return nodes_gdf, edges_gdf
 def create_street_layers(nodes_gdf, edges_gdf):
-    # Edges as a GeoJsonLayer or PathLayer
+    # Only geometry/positions are rendered; drop the OSM attribute columns
+    # (osmid lists, highway, name, ...) so they are not serialized to JSON
+    # Edges as a GeoJsonLayer
     edges_layer = pdk.Layer(
         "GeoJsonLayer",
-        data=edges_gdf,   
-        pickable=False,
+        data=edges_gdf[["geometry"]],
         stroked=True,
-        filled=False,
-        lineWidthScale=2,
-        lineWidthMinPixels=2,
+        filled=False,         # We don't fill lines
+        lineWidthScale=1,
+        lineWidthMinPixels=1,
         get_line_color=[0, 0, 255],
-        get_line_width=2
+        get_line_width=2,
     )
     # Nodes as a ScatterplotLayer
     nodes_layer = pdk.Layer(
         "ScatterplotLayer",
-        data=nodes_gdf,
-        pickable=False,
+        nodes_gdf[["x", "y"]],
+        pickable=True,
+        opacity=1,
+        stroked=True,
+        filled=True,
+        radius_scale=3,
+        radius_min_pixels=1,
+        radius_max_pixels=100,
+        line_width_min_pixels=1,
         get_position=["x", "y"],
-        get_radius=10,
-        get_fill_color=[255, 255, 0],
+        get_fill_color=[255, 140, 0],
+        get_line_color=[0, 0, 0],
     )
     return [edges_layer, nodes_layer]
-def main():
-    # Streamlit page configuration
-    st.set_page_config(layout="wide")
+@st.cache_data
+def load_airbnb_data():
+    """
+    Load the Airbnb listings.
+    Returns:
+    - pandas.DataFrame: One row per listing.
+    """
+    df = pd.read_csv(
+        'data/hk_listing.csv',
+        usecols=[
+            "id",
+            "listing_url",
+            "name",
+            "host_is_superhost",
+            "neighbourhood_cleansed",
+            "latitude",
+            "longitude",
+            "review_scores_cleanliness",
+            "review_scores_checkin",
+            "review_scores_communication",
+            "review_scores_location",
+            "review_scores_value",
+        ],
+    )
+    return df
+
+
+@st.cache_data
+def load_h3_counts():
+    """
+    Load the listing counts per H3 cell, precomputed by scripts/build_h3.py.
+    Returns:
+    - pandas.DataFrame with columns h3_string and count.
+    """
+    return pd.read_parquet('data/hk_listing_h3.parquet')
+
 
-    # DuckDB connect
-    con = connect_to_duckdb()
-    df = con.sql("""
-    SELECT 
-    id,
-    listing_url,
-    name,
-    host_is_superhost,
-    neighbourhood_cleansed,
-    latitude,
-    longitude,
-    review_scores_cleanliness,
-    review_scores_checkin,
-    review_scores_communication,
-    review_scores_location,
-    review_scores_value
-    FROM read_csv('data/hk_listing.csv')
+@st.cache_resource
+def create_airbnb_layer(df):
+    """
+    Build the Airbnb listings Scatterplot layer.
+    Cached so the listings are only converted to deck.gl records once.
+    Only position, name and the row number are shipped to the browser;
+    the remaining columns are looked up from `df` on selection.
     """
-    ).df()
+    layer_df = df[["longitude", "latitude", "name"]].reset_index(names="row")
+    return pdk.Layer(
+        "ScatterplotLayer",
+        data=layer_df,
+        id="Airbnb",
+        get_position=["longitude", "latitude"],
+        get_fill_color=[0, 140, 255, 160],
+        get_line_color=[0, 0, 0, 255],
+        pickable=True,
+        stroked=True,
+        filled=True,
+        radius_scale=1,
+        radius_min_pixels=3,
+        radius_max_pixels=10,
+        line_width_min_pixels=1
+    )
+
 
-    con.sql(
+@st.cache_resource
+def create_h3_layer(h3_df):
     """
-            CREATE OR REPLACE TABLE airbnb AS
-            WITH CTE AS (
-            SELECT latitude,longitude,
-            h3_latlng_to_cell_string (latitude,longitude,9) as h3_string,
-            FROM read_csv_auto('data/hk_listing.csv')
-            )
-            SELECT h3_string,
-            COUNT(*) as count
-            FROM CTE
-            GROUP BY h3_string
+    Build the city-wide H3 density layer.
     """
-            )
+    return pdk.Layer(
+        "H3HexagonLayer",
+        h3_df,
+        pickable=True,
+        stroked=True,
+        filled=True,
+        extruded=False,
+        get_hexagon="h3_string",
+        get_fill_color="[255 - count, 255, count]",
+        get_line_color=[255, 255, 255],
+        line_width_min_pixels=2
+    )
+
 
-    #print (con.sql("""SHOW TABLES"""))
+def main():
+    # Streamlit page configuration
+    st.set_page_config(layout="wide")
 
-    h3_df=con.sql("""SELECT * FROM airbnb""").df()
-    print (h3_df.head())
+    df = load_airbnb_data()
+    h3_df = load_h3_counts()
 
     # Initialize session state for events
    
     
     st.title("Explore Street Density Around your Airbnb Units")
-    st.write(
+    st.text(
         """
         Overview:
         In this section, I use OpenStreetMap's OSMnx to calculate the street density around any Airbnb locations listed (Source: Inside Airbnb).
@@ -119,21 +156,7 @@ def main():
     user_radius = st.number_input("Radius in meters", value=1000, min_value=100, max_value=10000, step=100)
 
     # Define our Scatterplot layer
-    layer = pdk.Layer(
-        "ScatterplotLayer",
-        data=df,
-        id="Airbnb",
-        get_position=["longitude", "latitude"],
-        get_fill_color=[0, 140, 255, 160],
-        get_line_color=[0, 0, 0, 255],
-        pickable=True,
-        stroked=True,
-        filled=True,
-        radius_scale=1,
-        radius_min_pixels=3,
-        radius_max_pixels=10,
-        line_width_min_pixels=1
-    )
+    layer = create_airbnb_layer(df)
 
     # Pydeck tooltip
     tooltip = {
@@ -165,7 +188,8 @@ def main():
         and "Airbnb" in event.selection.objects
     ): 
         
-        selected_obj = event.selection.objects["Airbnb"][0]  # single-object mode => first item
+        picked = event.selection.objects["Airbnb"][0]  # single-object mode => first item
+        selected_obj = df.iloc[picked["row"]].to_dict()
         sel_lat = selected_obj["latitude"]
         sel_lon = selected_obj["longitude"]
         apt_name = selected_obj["name"]
@@ -190,97 +214,57 @@ def main():
     if "selected_airbnb" in st.session_state:
         selected_airbnb = st.session_state["selected_airbnb"]
         
-        st.write(f"**Selected Airbnb (Names might not be accurate as source is scraped)**: {selected_airbnb['name']}")
-        st.write(f"**Coordinates**: Latitude={selected_airbnb['lat']}, Longitude={selected_airbnb['lon']}")
-        st.write(f"**District**: {selected_airbnb['district']}")
-
-        nodes_gdf, edges_gdf = get_street_network(
-                selected_airbnb["lat"], selected_airbnb["lon"],
-                radius=user_radius,        # Use user-defined radius
-                network_type=network_type  # Use user-defined network type
+        st.markdown(
+            f"**Selected Airbnb (Names might not be accurate as source is scraped)**: {selected_airbnb['name']}  \n"
+            f"**Coordinates**: Latitude={selected_airbnb['lat']}, Longitude={selected_airbnb['lon']}  \n"
+            f"**District**: {selected_airbnb['district']}"
         )
-        # Calculate street density as an example
-        total_length_km = edges_gdf["length"].sum() / 1000.0
-        area_km2 = math.pi * (1**2)  # 1 km radius => pi*(1km^2)
-        density = total_length_km / area_km2
+
         with st.spinner('Calculating Street Density and Preparing New Maps...'):
-            time.sleep(2)
-            st.write(f"**Selected Street Density**: {density:.2f} km/km² within 1km radius")
-        street_layers = create_street_layers(nodes_gdf, edges_gdf)
-        second_layers=[
-                pdk.Layer(
-                "GeoJsonLayer",
-                data=edges_gdf,       # This is a GeoDataFrame with line geometries
-                stroked=True,
-                filled=False,         # We don't fill lines
-                lineWidthScale=1,
-                lineWidthMinPixels=1,
-                get_line_color=[0, 0, 255],
-                get_line_width=2,
-                
-            ),
-            pdk.Layer(
-                "ScatterplotLayer",
-                nodes_gdf,
-                pickable=True,
-                opacity=1,
-                stroked=True,
-                filled=True,
-                radius_scale=3,
-                radius_min_pixels=1,
-                radius_max_pixels=100,
-                line_width_min_pixels=1,
-                get_position=["x", "y"],
-                get_fill_color=[255, 140, 0],
-                get_line_color=[0, 0, 0],
+            nodes_gdf, edges_gdf = get_street_network(
+                    selected_airbnb["lat"], selected_airbnb["lon"],
+                    radius=user_radius,        # Use user-defined radius
+                    network_type=network_type  # Use user-defined network type
             )
-
-
-        ]
-        second_view_state = pdk.ViewState(
-            latitude=selected_airbnb["lat"],
-            longitude=selected_airbnb["lon"],
-            zoom=14
-        )
-        deck2 = pdk.Deck(
-            layers=second_layers,
-            initial_view_state=second_view_state
+            # Calculate street density within the user-defined radius
+            radius_km = user_radius / 1000.0
+            total_length_km = float(edges_gdf["length"].to_numpy().sum()) / 1000.0
+            area_km2 = math.pi * radius_km**2
+            density = total_length_km / area_km2
+            second_layers = create_street_layers(nodes_gdf, edges_gdf)
+            second_view_state = pdk.ViewState(
+                latitude=selected_airbnb["lat"],
+                longitude=selected_airbnb["lon"],
+                zoom=14
+            )
+            deck2 = pdk.Deck(
+                layers=second_layers,
+                initial_view_state=second_view_state
             
-        )
-        deck3 = pdk.Deck(
-        layers= pdk.Layer(
-                "H3HexagonLayer",
-                h3_df,
-                pickable=True,
-                stroked=True,
-                filled=True,
-                extruded=False,
-                get_hexagon="h3_string",
-                get_fill_color="[255 - count, 255, count]",
-                get_line_color=[255, 255, 255],
-                line_width_min_pixels=2
-                )
-
-        ,  
-        initial_view_state=pdk.ViewState(
-            latitude=22.3193,     # Approximate latitude for Hong Kong
-            longitude=114.1694,   # Approximate longitude for Hong Kong
-            zoom=10
+            )
+            deck3 = pdk.Deck(
+            layers=create_h3_layer(h3_df),
+            initial_view_state=pdk.ViewState(
+                latitude=22.3193,     # Approximate latitude for Hong Kong
+                longitude=114.1694,   # Approximate longitude for Hong Kong
+                zoom=10
             
-    )
+        )
     
-    )
+        )
+
+        st.write(f"**Selected Street Density**: {density:.2f} km/km² within {radius_km:g}km radius")
 
         # Split into two columns
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("Selected Street Network for Selected Airbnb")
-            st.pydeck_chart(deck2)
+            components.html(deck2.to_html(as_string=True), height=500)
 
         with col2:
             st.subheader("Full-City H3 Grid View of Airbnb Density")
-            st.pydeck_chart(deck3)
+            components.html(deck3.to_html(as_string=True), height=500)
                 
                 
            
@@ -3,14 +3,16 @@ import os
 import duckdb
 import pandas as pd
 import pydeck as pdk
-import geopandas as gpd
 import requests
 import json 
 
 
+@st.cache_resource
 def connect_to_duckdb(db_path ='data/coffee.db'):
     """
     Connect to the DuckDB database and load the spatial extension.
+    The connection is shared across sessions and isn't thread-safe, so
+    query through con.cursor().
     Parameters:
     - db_path (str): Path to the DuckDB database.
     Returns:
@@ -21,6 +23,77 @@ def connect_to_duckdb(db_path ='data/coffee.db'):
     con.execute("LOAD spatial;")
     return con
 
+@st.cache_data(ttl=3600)
+def load_coffee_df():
+    """
+    Load the Foursquare coffee shops from DuckDB. The result is fetched as
+    Arrow and kept Arrow-backed in pandas to skip the NumPy conversion copy.
+    Returns:
+    - pandas.DataFrame: name, longitude, latitude, website and tel per shop.
+    """
+    with connect_to_duckdb().cursor() as cur:
+        tbl = cur.sql("SELECT name, longitude, latitude, website, tel FROM fsq_coffee").arrow()
+    return tbl.to_pandas(types_mapper=pd.ArrowDtype)
+
+# Citywide view of Hong Kong
+DEFAULT_VIEW = {"latitude": 22.3193, "longitude": 114.1694, "zoom": 10}
+
+# Pydeck tooltip
+TOOLTIP = {
+    "html": "<b>Name:</b> {name}",
+    "style": {
+        "backgroundColor": "steelblue",
+        "color": "white"
+    }
+}
+
+@st.cache_resource
+def create_coffee_layer(df):
+    """
+    Build the coffee shop scatterplot layer. Cached as a resource so every
+    viewport and session reuses the same serialized point data.
+    Parameters:
+    - df (pandas.DataFrame): Shops from load_coffee_df.
+    Returns:
+    - pdk.Layer: ScatterplotLayer with id "Coffee Shop".
+    """
+    # Only ship what the map needs; website/tel are looked up by row on click
+    render_df = df[["name", "longitude", "latitude"]].reset_index(names="row")
+    return pdk.Layer(
+        "ScatterplotLayer",
+        data=render_df,
+        id="Coffee Shop",
+        get_position=["longitude", "latitude"],
+        get_fill_color=[0, 140, 255, 160],
+        get_line_color=[0, 0, 0, 255],
+        pickable=True,
+        stroked=True,
+        filled=True,
+        radius_scale=1,
+        radius_min_pixels=3,
+        radius_max_pixels=10,
+        line_width_min_pixels=1
+    )
+
+def build_deck(latitude, longitude, zoom, layer, tooltip):
+    """
+    Create a deck at the given lat/lon/zoom.
+    Returns:
+    - pdk.Deck
+    """
+    view_state = pdk.ViewState(
+        latitude=latitude,
+        longitude=longitude,
+        zoom=zoom,
+        bearing=0,
+        pitch=0
+    )
+    return pdk.Deck(
+        layers=[layer],
+        initial_view_state=view_state,
+        tooltip=tooltip
+    )
+
 # def load_map(session_state):
 
 
@@ -28,23 +101,16 @@ def main():
     # Streamlit page configuration
     st.set_page_config(layout="wide")
 
-    # DuckDB connect
-    con = connect_to_duckdb()
-    df = con.sql("SELECT name, longitude, latitude, website, tel FROM fsq_coffee").df()
+    df = load_coffee_df()
     
     st.title("Explore Coffee Shops in Hong Kong Using Foursquare POI Dataset")
-    st.write(
+    st.text(
         """
         Overview:
-        
-        A very simple visualization of coffee shops in Hong Kong using 
-        Foursquare's latest open POI data.
-        
-        I attempt to implement an on-click event handling for zooming 
-        and returning specific information on the point. Pydeck in 
-        Streamlit doesn't support this feature natively. Right now I 
-        have implemented a very simple workaround, but I will continue 
-        to explore if I can build a custom component for this simple feature.
+
+        A very simple visualization of coffee shops in Hong Kong using Foursquare's latest open POI data.
+
+        I attempt to implement an on-click event handling for zooming and returning specific information on the point. Pydeck in Streamlit doesn't support this feature natively. Right now I have implemented a very simple workaround, but I will continue to explore if I can build a custom component for this simple feature.
         """
     )
     st.markdown(
@@ -52,13 +118,9 @@ def main():
         unsafe_allow_html=True
     )
 
-    # Initialize session state for events
-    if "current_event_num" not in st.session_state:
-        st.session_state["current_event_num"] = 1
-
-    # Dictionary to hold all pydeck chart objects by key: "event1", "event2", ...
-    if "events" not in st.session_state:
-        st.session_state["events"] = {}
+    # The viewport drives which deck is shown
+    if "view" not in st.session_state:
+        st.session_state["view"] = dict(DEFAULT_VIEW)
     
     #Initialize selected shop 
     if "selected_shop" not in st.session_state:
@@ -67,76 +129,21 @@ def main():
     map_container = st.empty()
     info_container = st.empty()
 
-    # Define our Scatterplot layer
-    layer = pdk.Layer(
-        "ScatterplotLayer",
-        data=df,
-        id="Coffee Shop",
-        get_position=["longitude", "latitude"],
-        get_fill_color=[0, 140, 255, 160],
-        get_line_color=[0, 0, 0, 255],
-        pickable=True,
-        stroked=True,
-        filled=True,
-        radius_scale=1,
-        radius_min_pixels=3,
-        radius_max_pixels=10,
-        line_width_min_pixels=1
-    )
+    # Decks already built this session, keyed by viewport
+    if "decks" not in st.session_state:
+        st.session_state["decks"] = {}
 
-    # Pydeck tooltip
-    tooltip = {
-        "html": "<b>Name:</b> {name}",
-        "style": {
-            "backgroundColor": "steelblue",
-            "color": "white"
-        }
-    }
-
-        # Function to create a deck at given lat/lon/zoom
-    def create_deck(latitude, longitude, zoom=10):
-        view_state = pdk.ViewState(
-            latitude=latitude,
-            longitude=longitude,
-            zoom=zoom,
-            bearing=0,
-            pitch=0
-        )
-        return pdk.Deck(
-            layers=[layer],
-            initial_view_state=view_state,
-            tooltip=tooltip
+    view = st.session_state["view"]
+    deck_key = (round(view["latitude"], 4), round(view["longitude"], 4), view["zoom"])
+    if deck_key not in st.session_state["decks"]:
+        st.session_state["decks"][deck_key] = build_deck(
+            view["latitude"], view["longitude"], view["zoom"],
+            create_coffee_layer(df), TOOLTIP
         )
 
-    # Figure out which event key we are dealing with
-    #current_event_key= event1,2,3...
-    current_event_key = f"event{st.session_state['current_event_num']}"
-    print (current_event_key)
-
-    # If we haven't created this "event" deck yet, do so
-    if current_event_key not in st.session_state["events"]:
-        print ('true')
-        
-        # For the first event, default citywide view
-        if st.session_state["current_event_num"] == 1:
-            st.session_state["events"][current_event_key] = create_deck(
-                latitude=22.3193,
-                longitude=114.1694,
-                zoom=10
-            )
-        else:
-            print ('came to the else')
-            # Fallback or placeholder if an event somehow got created
-            # without a specific lat/lon. (Right now it uses the same city view.)
-            st.session_state["events"][current_event_key] = create_deck(
-                latitude=22.3193,
-                longitude=114.1694,
-                zoom=10
-            )
-
-    # Display the current deck
+    # Display the deck for the current viewport
     current_deck = map_container.pydeck_chart(
-        st.session_state["events"][current_event_key],
+        st.session_state["decks"][deck_key],
         on_select="rerun",
         selection_mode="single-object"
     )
@@ -145,24 +152,17 @@ def main():
     if st.session_state["selected_shop"] is not None:
         obj = st.session_state["selected_shop"]
         # Display details about this previously selected coffee shop
-        info_html = f"""
-        <span style='color: #0066cc; font-weight: bold;'>Selected coffee shop: {obj['name']}</span><br>
-        """
-        if obj["website"]:
-            info_html += f"<span style='color: #0066cc; font-weight: bold;'>Website: {obj['website']}</span><br>"
-        else:
-            info_html += "<span style='color: #0066cc; font-weight: bold;'>Website Info Not Provided!</span><br>"
-
-        if obj["tel"]:
-            info_html += f"<span style='color: #0066cc; font-weight: bold;'>Telephone Number: {obj['tel']}</span><br>"
-        else:
-            info_html += "<span style='color: #0066cc; font-weight: bold;'>Phone Number Not Available!</span><br>"
-
-        info_container.markdown(info_html, unsafe_allow_html=True)
+        span = "<span style='color: #0066cc; font-weight: bold;'>{}</span><br>"
+        info_rows = [
+            f"Selected coffee shop: {obj['name']}",
+            f"Website: {obj['website']}" if obj["website"] else "Website Info Not Provided!",
+            f"Telephone Number: {obj['tel']}" if obj["tel"] else "Phone Number Not Available!",
+        ]
+        # One markdown call for the whole panel
+        info_container.markdown("".join(span.format(row) for row in info_rows), unsafe_allow_html=True)
 
     # Check the current selection from the deck
     selection = current_deck.selection
-    print (selection)
     # Uncomment this if you want to see the raw selection in the UI:
     # st.write("Raw selection state:", selection)
 
@@ -172,33 +172,26 @@ def main():
         and hasattr(selection, "objects")
         and "Coffee Shop" in selection.objects
     ):  
-        print ('here has a selection')
         # The first object in the "Coffee Shop" list
-        obj = selection.objects["Coffee Shop"][0]
+        picked = selection.objects["Coffee Shop"][0]
+        obj = df.iloc[picked["row"]].to_dict()
 
         # Store the details in session_state so we remember it after rerun
         st.session_state["selected_shop"] = obj
 
-        # Create and store a new event (zoomed-in view) for the next run
-        st.session_state["current_event_num"] += 1
-        new_event_key = f"event{st.session_state['current_event_num']}"
-        print (f'at the end {new_event_key}')
-
-        st.session_state["events"][new_event_key] = create_deck(
-            latitude=obj["latitude"],
-            longitude=obj["longitude"],
-            zoom=18
-        )
-
-        # Force a rerun to pick up the new event deck
-        st.rerun()
+        # Zoom in on the shop. A changed viewport yields a new chart (and a
+        # cleared selection); skip the rerun when we are already there
+        new_view = {"latitude": obj["latitude"], "longitude": obj["longitude"], "zoom": 18}
+        if new_view != st.session_state["view"]:
+            st.session_state["view"] = new_view
+            st.rerun()
 
     # Reset button
     if st.button("Reset View"):
-        # Clear out everything: events, selected shop, event number
-        st.session_state["events"] = {}
+        # Clear out everything: viewport, selected shop and built decks
+        st.session_state["view"] = dict(DEFAULT_VIEW)
         st.session_state["selected_shop"] = None
-        st.session_state["current_event_num"] = 1
+        st.session_state["decks"] = {}
         st.rerun()
 
 
@@ -1,20 +1,27 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 import duckdb
 import pydeck as pdk
-import geopandas as gpd
 import pandas as pd
 
 
+@st.cache_data
+def load_population():
+    """
+    Load the H3 population grid, converted from CSV by scripts/build_hk_pop_dist.py.
+    Returns:
+    - pandas.DataFrame with columns hex_id and total_population.
+    """
+    return pd.read_parquet('data/hk_pop_dist.parquet', columns=['hex_id', 'total_population'])
+
+
 def main():
     st.set_page_config(layout="wide")
     st.title("Visualize Population Distribution of HongKong By H3 Grid")
-    st.write('Overview:')
-    st.write("""
-             Demographic data usually comes in irregular shape (Census block, group, etc). Hong Kong population distribution datasets available on ESRI HongKong
-             are categorized by local planning units. To come up with a uniformly shaped population data across any location, similar to what Kontur offers,
-             I intersected planning units with H3 cells, calculated the percent of overlapping area, multiplied population proportionally as a simplification,
-             and then sum everything up based on H3 hexagon cells. Please refer to the code in my repo!
+    st.text('Overview:')
+    st.text("""
+             Demographic data usually comes in irregular shape (Census block, group, etc). Hong Kong population distribution datasets available on ESRI HongKong are categorized by local planning units. To come up with a uniformly shaped population data across any location, similar to what Kontur offers, I intersected planning units with H3 cells, calculated the percent of overlapping area, multiplied population proportionally as a simplification, and then sum everything up based on H3 hexagon cells. Please refer to the code in my repo!
              """)
     
 
@@ -24,7 +31,7 @@ def main():
                     col1, col2 = st.columns([4, 1])
                     with col1:
                       
-                      df_h3=pd.read_csv('data/hk_pop_dist.csv')
+                      df_h3=load_population()
 
                       view_state = pdk.ViewState(
                         longitude=114.1694 ,
@@ -57,7 +64,7 @@ def main():
                         }
 
                       r = pdk.Deck(layers=[layer], initial_view_state=view_state,tooltip=tooltip)
-                      st.pydeck_chart(r)
+                      components.html(r.to_html(as_string=True), height=500)
                       st.markdown(
                               """<a href="https://www.kontur.io/portfolio/population-dataset/" target="_blank"><em>🔗 Reference to Kontur Global Population Data</em></a>""",
                               unsafe_allow_html=True
@@ -1,14 +1,35 @@
 import os
-import ijson
 import re
-import geopandas as gpd
+import hashlib
+import json
 import duckdb
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-from shapely import wkt
 import pydeck  as pdk
+import real_estate_sql
 
 
+@st.cache_resource
+def connect_to_duckdb(db_path='hong_kong_data.duckdb'):
+    """
+    Connect to the DuckDB database and load the spatial extension.
+    The connection is shared across reruns and sessions, so the lot tables
+    and the extension stay loaded. It isn't thread-safe; run queries on
+    con.cursor() rather than on the connection itself.
+
+    Parameters:
+    - db_path (str): Path to the DuckDB database file.
+
+    Returns:
+    - DuckDB connection object.
+    """
+    con = duckdb.connect(database=db_path, read_only=False)
+    con.execute("INSTALL spatial;")
+    con.execute("LOAD spatial;")
+    con.execute("SET enable_object_cache=true;")
+    return con
+
 def is_geojson_empty(file_path):
     """
     Check if a GeoJSON file has no features.
@@ -20,23 +41,19 @@ def is_geojson_empty(file_path):
     - bool: True if the GeoJSON has no features, False otherwise.
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # Create an ijson parser
-            parser = ijson.parse(f)
-            for prefix, event, value in parser:
-                if prefix == 'features.item' and event == 'start_map':
-                    # Found the start of the first feature
-                    return False
-                elif prefix == 'features' and event == 'start_array':
-                    continue
-                elif prefix == 'features' and event == 'end_array':
-                    # Reached the end of the features array without finding any features
-                    break
-        return True  # No features found
+        with connect_to_duckdb().cursor() as cur:
+            # ST_Read streams features, so LIMIT 1 stops after the first one
+            count = cur.execute(
+                "SELECT count(*) FROM (SELECT 1 FROM st_read(?) LIMIT 1)", [file_path]
+            ).fetchone()[0]
+        return count == 0
     except Exception as e:
         # Log the error if necessary
         print(f"Error checking GeoJSON file {file_path}: {e}")
         return True  # Assume empty if there's an error
+# Any character that is not alphanumeric, underscore, or hyphen
+_SANITIZE_RE = re.compile(r'[^\w\-]')
+
 def sanitize_filename(name):
     """
     Sanitize the district name to create a valid filename.
@@ -45,16 +62,65 @@ def sanitize_filename(name):
     # Replace spaces with underscores
     name = name.replace(' ', '_')
     # Remove any character that is not alphanumeric, underscore, or hyphen
-    name = re.sub(r'[^\w\-]', '', name)
+    name = _SANITIZE_RE.sub('', name)
     return name
+def lot_source(sanitized_name, output_directory='data'):
+    """
+    Find a district's lot Parquet files and name the table they load into.
+    The name carries a digest of each file's path and mtime, so replacing
+    or re-sorting the files gets a fresh table instead of the stale one.
+
+    Parameters:
+    - sanitized_name (str): Sanitized district name.
+    - output_directory (str): Directory holding the lot files.
+
+    Returns:
+    - (tuple of str, str): Lot file paths and the lot table name.
+    """
+    # For districts with split files ("North", "Tai Po", "Yuen Long"), read all four parts
+    lot_paths = real_estate_sql.lot_paths(sanitized_name, output_directory)
+    digest = hashlib.md5(
+        "|".join(f"{path}:{os.path.getmtime(path)}" for path in lot_paths).encode()
+    ).hexdigest()[:8]
+    return lot_paths, f"{sanitized_name}_lot_{digest}"
+
+def ensure_lot_table(cur, sanitized_name, lot_paths, lot_table):
+    """
+    Load a district's lots into lot_table unless it already exists, and drop
+    tables built from older versions of the same files. Geometry is kept at
+    full resolution; simplification happens when the map data is selected.
+
+    Parameters:
+    - cur: DuckDB cursor from connect_to_duckdb().cursor().
+    - sanitized_name (str): Sanitized district name.
+    - lot_paths (tuple of str): Lot Parquet files, from lot_source.
+    - lot_table (str): Table name, from lot_source.
+    """
+    try:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {lot_table} AS {real_estate_sql.lot_select_sql(lot_paths)};")
+        stale = cur.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE starts_with(table_name, ?) AND table_name <> ? AND NOT temporary",
+            [f"{sanitized_name}_lot", lot_table]
+        ).fetchall()
+        for (table_name,) in stale:
+            cur.execute(f'DROP TABLE IF EXISTS "{table_name}";')
+    except duckdb.TransactionException:
+        # Another session built or dropped the same table at the same time;
+        # fine as long as the lot table is there now
+        exists = cur.execute(
+            "SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [lot_table]
+        ).fetchone()[0]
+        if not exists:
+            raise
+
 @st.cache_data
-def build_duckdb_queries(sanitized_name, district_lot_geojson_path, district_housing_geojson_path):
+def build_duckdb_queries(sanitized_name, lot_table, district_housing_geojson_path):
     """
     Build a list of DuckDB SQL queries for the selected district.
 
     Parameters:
     - sanitized_name (str): Sanitized district name.
-    - district_lot_geojson_path (str): Path to the district's lot GeoJSON file.
+    - lot_table (str): Table holding the district's lots, from lot_source.
     - district_housing_geojson_path (str): Path to the district's housing GeoJSON file.
 
     Returns:
@@ -71,169 +137,113 @@ def build_duckdb_queries(sanitized_name, district_lot_geojson_path, district_hou
         return queries
 
     # Proceed to build queries only if housing data is not empty
-
-    # For districts with split files ("North", "Tai Po", "Yuen Long"), we need to handle them differently
-    if sanitized_name in ["North", "Tai_Po", "Yuen_Long"]:
-        print (f'{sanitized_name}')
-        # Assume we have 4 parts for each of the split districts
-        part_files = [f"data/{sanitized_name}_lot_part{i+1}.parquet" for i in range(4)]
-        
-        # Construct the UNION ALL query to combine all parts of the split files
-        union_query = " UNION ALL ".join([f"SELECT OBJECTID,LOTID,ST_simplify(geometry,0.0001) as geom FROM read_parquet('{file}')" for file in part_files])
-        
-        # Query 1: Create or replace table for combined lot data
-        query1 = f"""
-        CREATE OR REPLACE TABLE {sanitized_name}_lot AS
-        {union_query};
-        """
-        queries.append(query1)
-    
-    else:
-        # For districts that do not have split files, load the single GeoJSON file as usual
-        query1 = f"""
-        CREATE OR REPLACE TABLE {sanitized_name}_lot AS
-        SELECT OBJECTID, LOTID,
-        geometry as geom
-        FROM read_parquet('{district_lot_geojson_path}');
-        """
-        queries.append(query1)
+    # (the lot table itself is created by ensure_lot_table)
 
     # Query 2: Create or replace table for housing units
+    # Temp tables belong to the cursor, so concurrent sessions don't
+    # overwrite each other's working tables
     query2 = f"""
-    CREATE OR REPLACE TABLE housing_units AS 
-    SELECT 
-        date, 
-        address, 
-        price, 
-        CASE 
-        WHEN changes LIKE '--' THEN 0 
-        ELSE CAST(REGEXP_REPLACE(changes, '%', '') AS INT) 
-        END AS changes,
-        "saleable_area(ft^2)", 
-        unit_rate, 
-        district, 
-        Tower, 
-        Flat, 
-        Phase, 
-        Block, 
-        Rental, 
-        "Public Housing",   
-        floor, 
-        latitude,
-        longitude,
-        geom
-    FROM st_read('{district_housing_geojson_path}');
+    CREATE OR REPLACE TEMP TABLE housing_units AS
+    {real_estate_sql.housing_units_sql(district_housing_geojson_path)};
     """
     queries.append(query2)
 
-    # Query 3: Create average_price_per_lot table
+    # Query 3: Create lots_with_avg_price table in one pass
+    # (same SQL as scripts/build_lots_with_avg_price.py, see real_estate_sql)
     query3 = f"""
-    CREATE OR REPLACE TABLE average_price_per_lot AS
-    SELECT
-        lot.LOTID,
-        AVG(h.unit_rate) AS avg_unit_price,
-        AVG(h.changes) AS avg_change
-    FROM
-        {sanitized_name}_lot AS lot
-    LEFT JOIN
-        housing_units AS h
-    ON
-        ST_Contains(lot.geom, h.geom)
-    GROUP BY
-        lot.LOTID;
+    CREATE OR REPLACE TEMP TABLE lots_with_avg_price AS
+    {real_estate_sql.lots_with_avg_price_sql(lot_table, 'housing_units')};
     """
     queries.append(query3)
-    # Query 4: Create lots_with_avg_price table
-    query4 = f"""
-    CREATE OR REPLACE TABLE lots_with_avg_price AS 
-    SELECT
-        lot.*,
-        COALESCE(avg_price.avg_unit_price, 0) AS avg_unit_price,
-        COALESCE(avg_price.avg_change,0) as avg_change_percent
-    FROM
-        {sanitized_name}_lot AS lot
-    LEFT JOIN
-        average_price_per_lot AS avg_price
-    ON
-        lot.LOTID = avg_price.LOTID;
-    """
-    queries.append(query4)
     return queries
 
-@st.cache_data
-def execute_duckdb_queries(queries, db_path='hong_kong_data.duckdb'):
+def execute_duckdb_queries(cur, queries):
     """
     Execute a list of DuckDB SQL queries.
 
     Parameters:
+    - cur: DuckDB cursor from connect_to_duckdb().cursor().
     - queries (list of str): List of SQL queries to execute.
-    - db_path (str): Path to the DuckDB database file. Defaults to in-memory.
 
     Returns:
     - None
     """
-    if not queries:
-        st.warning("⚠️ No data in the selected area.")
-        return
-    con = duckdb.connect(database=db_path, read_only=False)
-    # Load spatial extension
-    con.execute("INSTALL spatial;")
-    con.execute("LOAD spatial;")
     for idx, query in enumerate(queries, start=1):
         try:
-            con.execute(query)
-            #st.write(f"✅ Query {idx} executed successfully.")
+            cur.execute(query)
         except Exception as e:
-            st.error(f"❌ Error executing Query {idx}: {e}")
-            con.close()
-            raise e
-    con.close()
+            raise RuntimeError(f"Query {idx} failed: {e}") from e
 
-@st.cache_data
-def execute_duckdb_select_query(sanitized_name, db_path='hong_kong_data.duckdb'):
+# Simplification tolerance (degrees) for each level of lot geometry detail
+GEOMETRY_DETAIL = {"Coarse": 0.0005, "Default": 0.0001, "Full": 0.0}
+
+def execute_duckdb_select_query(cur, tolerance=GEOMETRY_DETAIL["Default"], precomputed_path=None):
     """
     Execute a DuckDB SELECT query to retrieve the final results.
 
     Parameters:
-    - sanitized_name (str): Sanitized district name.
-    - db_path (str): Path to the DuckDB database file. Defaults to in-memory.
-    - limit (int): Number of records to retrieve.
+    - cur: DuckDB cursor from connect_to_duckdb().cursor().
+    - tolerance (float): Simplification tolerance in degrees; 0 keeps full resolution.
+    - precomputed_path (str): Output of scripts/build_lots_with_avg_price.py to read
+      instead of the lots_with_avg_price table, if available.
 
     Returns:
-    - pandas.DataFrame: Resulting DataFrame from the SELECT query.
+    - pandas.DataFrame: LOTID, average price and change per lot.
+    - list of dict: The same lots with their GeoJSON geometry, as the
+      records the GeoJsonLayer takes.
     """
-    
-    con = duckdb.connect(database=db_path, read_only=False)
-    con.execute("LOAD spatial;")
-    try:
-        query = f"""
-        SELECT LOTID,avg_unit_price,avg_change_percent,ST_ASTEXT(geom) as wkt_geom
-        FROM lots_with_avg_price
-        ORDER BY avg_unit_price DESC
-        ;
-        """
-        result = con.execute(query).df()  
-        #Need a gdf as well for pydeck geojson layer? 
-        result['geometry'] = result['wkt_geom'].apply(wkt.loads)
-        #gdf= gpd.GeoDataFrame(result, geometry='geometry')
-        con.close()
-        return result
-    except Exception as e:
-        con.close()
-        st.error(f"❌ Error executing SELECT query: {e}")
-        return   # Return empty DataFrame on error
-    
+    source = f"read_parquet('{precomputed_path}')" if precomputed_path else "lots_with_avg_price"
+    query = f"""
+    SELECT LOTID,avg_unit_price,avg_change_percent,
+    json_object(
+        'LOTID', LOTID,
+        'avg_unit_price', avg_unit_price,
+        'avg_change_percent', avg_change_percent,
+        'geometry', ST_AsGeoJSON(ST_SimplifyPreserveTopology(geom, ?))::JSON
+    ) as record
+    FROM {source}
+    ORDER BY avg_unit_price DESC
+    ;
+    """
+    result_df = cur.execute(query, [tolerance]).fetch_arrow_table().to_pandas(split_blocks=True, self_destruct=True, types_mapper=pd.ArrowDtype)
+    # One json.loads over the whole column instead of one per lot
+    records = json.loads("[" + ",".join(result_df['record']) + "]")
+    return result_df.drop(columns=['record']), records
+
 @st.cache_data
-def gdf_create(result_df):
-     #Create a geopandas dataframe
-     gdf = gpd.GeoDataFrame(result_df, geometry='geometry')
-     return gdf 
-    
+def load_lot_prices(sanitized_name, lot_paths, lot_table, district_housing_geojson_path, tolerance, precomputed_path=None):
+    """
+    Compute the average price per lot for a district and select it for the map.
+    Populating and selecting happen in the same cached call, keyed on the
+    district and tolerance, so a result always belongs to the district asked for.
+
+    Parameters:
+    - sanitized_name (str): Sanitized district name.
+    - lot_paths (tuple of str): Lot Parquet files, from lot_source.
+    - lot_table (str): Lot table name, from lot_source.
+    - district_housing_geojson_path (str): Path to the district's housing GeoJSON file.
+    - tolerance (float): Simplification tolerance in degrees.
+    - precomputed_path (str): Precomputed lots_with_avg_price Parquet, if available.
+
+    Returns:
+    - (pandas.DataFrame, list of dict) from execute_duckdb_select_query,
+      or None if the district has no housing data.
+    """
+    # Each call gets its own cursor, and with it its own temp tables
+    with connect_to_duckdb().cursor() as cur:
+        if precomputed_path is None:
+            queries = build_duckdb_queries(sanitized_name, lot_table, district_housing_geojson_path)
+            if not queries:
+                return None
+            ensure_lot_table(cur, sanitized_name, lot_paths, lot_table)
+            execute_duckdb_queries(cur, queries)
+        return execute_duckdb_select_query(cur, tolerance, precomputed_path)
+
 def main():
     st.set_page_config(layout="wide")
     st.title("Hong Kong Housing Price Visualizer")
-    st.write("Overview: I built an interactive Hong Kong housing price visualizer using Streamlit, DuckDB, and PyDeck, where we transformed the housing data through clipping, aggregation, and geometry simplification, efficiently handling large datasets in parquet format to showcase housing price trends from 2020 to 2023 across different districts categorized by lot")
-    st.write("Select a scale and district to view corresponding data.")
+    st.text("Overview: I built an interactive Hong Kong housing price visualizer using Streamlit, DuckDB, and PyDeck, where we transformed the housing data through clipping, aggregation, and geometry simplification, efficiently handling large datasets in parquet format to showcase housing price trends from 2020 to 2023 across different districts categorized by lot")
+    st.text("Select a scale and district to view corresponding data.")
 
     # Define your scale options
     scale_options = ["Lot"]
@@ -265,7 +275,9 @@ def main():
             "Tuen Mun",
             "Yuen Long"
         ]
-        selected_district = st.selectbox("Select a District (Lot geometry is simplified in some districts due to size limit)", options=districts)
+        selected_district = st.selectbox("Select a District", options=districts)
+        # Citywide view doesn't need every vertex; full detail is opt-in
+        detail = st.select_slider("Lot geometry detail", options=list(GEOMETRY_DETAIL), value="Default")
 
     # Step 3: Display the selected values and execute queries
     if selected_district:
@@ -273,52 +285,44 @@ def main():
         output_directory = 'data'  # Replace with your actual output directory path
         sanitized_name = sanitize_filename(selected_district)
         
-        # Define lot and housing GeoJSON paths
-        district_lot_geojson_path = os.path.join(output_directory, f"{sanitized_name}_lot.parquet")
+        # Define lot files/table and housing GeoJSON path
+        lot_paths, lot_table = lot_source(sanitized_name, output_directory)
         district_housing_geojson_path = os.path.join(output_directory, f"{sanitized_name}_hk2020.geojson")
         
         # Display selection
-        st.write(f"You selected: **Average Price by {selected_district} ({scale})**")
-        st.write("### Hold On! Extracting Data For You...")
+        st.markdown(f"You selected: **Average Price by {selected_district} ({scale})**\n\n### Hold On! Extracting Data For You...")
         
-        # Build DuckDB queries
+        # Prices per lot precomputed by scripts/build_lots_with_avg_price.py
+        precomputed_path = os.path.join(output_directory, f"{sanitized_name}_lots_with_avg_price.parquet")
+        if not os.path.exists(precomputed_path):
+            precomputed_path = None
+
         try:
-            queries = build_duckdb_queries(sanitized_name, district_lot_geojson_path, district_housing_geojson_path)
+            result = load_lot_prices(
+                sanitized_name, lot_paths, lot_table, district_housing_geojson_path,
+                GEOMETRY_DETAIL[detail], precomputed_path
+            )
         except Exception as e:
-            st.error(f"❌ Error building DuckDB queries: {e}")
+            st.error(f"❌ DuckDB queries failed: {e}")
             st.stop()
-        # Check if queries is empty
-        if not queries:
+        if result is None:
             st.warning("⚠️ Sorry,no data in the selected area within this dataset.")
             st.stop()
-        
-        # Execute the queries
-        try:
-            execute_duckdb_queries(queries)
-            st.success("All queries executed successfully.")
-        except Exception as e:
-            st.error(f"❌ DuckDB queries failed: {e}")
-            st.stop()
-        
-        # Execute SELECT query to retrieve results
-        # st.write("### Retrieving Results...")
+        result_df, records = result
+
         try:
-            result_df = execute_duckdb_select_query(sanitized_name)
             if not result_df.empty:
                   # Map is 4 times larger than DataFrame
 
                
                 with st.expander("Expand to see the data"):
                       st.write(f"#### {len(result_df)} Records Extracted")
-                      st.dataframe(result_df.drop(columns=['wkt_geom','geometry']))
+                      st.dataframe(result_df)
 
                 
                 with st.container():
                     col1, col2 = st.columns([4, 1])
                     with col1:
-                      #Make sure there is only one geom column
-                      gdf=gdf_create(result_df)
-
                       view_state = pdk.ViewState(
                         longitude=114.1694 ,
                         latitude=22.3193,
@@ -330,7 +334,7 @@ def main():
                     )
                       layer = pdk.Layer(
                         'GeoJsonLayer',
-                        gdf,
+                        records,
                         opacity=0.8,
                         stroked=False,
                         filled=True,
@@ -349,7 +353,7 @@ def main():
                         }
 
                       r = pdk.Deck(layers=[layer], initial_view_state=view_state,tooltip=tooltip)
-                      st.pydeck_chart(r)
+                      components.html(r.to_html(as_string=True), height=500)
                     with col2:
                         st.markdown("HongKong Housing Price Visualizer")
                         st.write("""
@@ -365,7 +369,6 @@ def main():
                         
                 
             else:
-                st.write(f"{sanitized_name}")
                 st.warning("No data available to display.")
         except Exception as e:
             st.error(f"❌ Error retrieving results: {e}")
@@ -1,14 +1,16 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 import duckdb
 import pandas as pd
 import pydeck as pdk
-import geopandas as gpd
 import requests
-import json 
+@st.cache_resource
 def connect_to_duckdb():
     """
     Connect to the DuckDB database and load the spatial extension.
+    The connection is shared across sessions and isn't thread-safe, so
+    query through con.cursor().
     Parameters:
     - db_path (str): Path to the DuckDB database.
     Returns:
@@ -17,47 +19,119 @@ def connect_to_duckdb():
     con=duckdb.connect(database=':memory:')
     con.execute("INSTALL spatial;")
     con.execute("LOAD spatial;")
+    # Overture Places is read straight from S3; keep parquet footers and
+    # HTTP connections around between queries
+    con.execute("INSTALL httpfs;")
+    con.execute("LOAD httpfs;")
+    con.execute("SET enable_object_cache=true;")
+    con.execute("SET http_keep_alive=true;")
+    con.execute("SET enable_http_metadata_cache=true;")
+    con.execute("SET s3_region='us-west-2';")
+    # The scan is network-bound, so run more range reads than there are cores
+    con.execute("SET threads=8;")
     return con
+@st.cache_data(ttl=86400, show_spinner=False)
+def search_nominatim(country):
+    """
+    Look up a place name on Nominatim. Country extents don't change, so the
+    response is cached for a day; failed requests raise and are not cached.
+    Parameters:
+    - country (str): Place name to search for.
+    Returns:
+    - list: Parsed JSON search results.
+    """
+    # Set up the request headers including a User-Agent
+    headers = {
+        'User-Agent': 'zluo43@wisc.edu'
+    }
+    r = requests.get(
+        "http://nominatim.openstreetmap.org/search",
+        params={"q": country, "format": "json"},
+        headers=headers,
+        timeout=10
+    )
+    r.raise_for_status()
+    return r.json()
+
 def get_country_bounding_box(country):
     try:
-        # Set up the request headers including a User-Agent
-        headers = {
-            'User-Agent': 'zluo43@wisc.edu'
-        }
-        
-        # Make the request to Nominatim API with the country name
-        r = requests.get(f"http://nominatim.openstreetmap.org/search?q={country}&format=json", headers=headers)
-
-        # Check if the response status code is 200 (OK)
-        if r.status_code == 200:
-            # Parse the response and get the bounding box
-            data = json.loads(r.text)
-
-            # Ensure there is at least one result
-            if len(data) > 0:
-                bounding_box = data[0]["boundingbox"]
-                # Convert bounding box values from string to float for easy manipulation
-                bounding_box = [float(coord) for coord in bounding_box]
-                return bounding_box
-            else:
-                print(f"No results found for {country}")
-                return None
+        # Nominatim ignores case, so normalize to share cache entries
+        data = search_nominatim(country.strip().lower())
+
+        # Ensure there is at least one result
+        if len(data) > 0:
+            bounding_box = data[0]["boundingbox"]
+            # Convert bounding box values from string to float for easy manipulation
+            bounding_box = [float(coord) for coord in bounding_box]
+            return bounding_box
         else:
-            print(f"Failed to retrieve data: {r.status_code}")
+            print(f"No results found for {country}")
             return None
+    except requests.RequestException as e:
+        print(f"Failed to retrieve data: {e}")
+        return None
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
     
-def main():
-    # Streamlit page configuration
+@st.cache_data
+def load_categories(path='data/categories.csv'):
+    """
+    Load the Overture category codes.
+    Parameters:
+    - path (str): Path to the categories CSV.
+    Returns:
+    - pandas.DataFrame with the 'Category code' column and its lowercase
+      copy 'cat_lower' for matching.
+    """
+    df = pd.read_csv(path, sep=";", engine='python', usecols=['Category code'])
+    df['cat_lower'] = df['Category code'].str.lower()
+    return df
 
-    #Duckdb conneect
-    con=connect_to_duckdb()
+# Above this many places the results are aggregated before mapping
+MAX_POINTS = 5000
 
+@st.cache_data(persist="disk", show_spinner=False)
+def load_overture_places(user_category, min_x, max_x, min_y, max_y):
+    """
+    Query Overture Places on S3 for one category within a bounding box.
+    Results are persisted to Streamlit's on-disk cache, so a repeated search
+    is served locally instead of scanning S3 again. More than MAX_POINTS
+    places are grouped into grid cells, labelled with their count.
+    Returns:
+    - pandas.DataFrame with name_value, lon and lat columns.
+    """
+    # Bind the user input as parameters so the query text stays constant
+    query = """ 
+    SELECT names.primary as name_value,ST_X(geometry) as lon, ST_Y(geometry) as lat
+    FROM read_parquet('s3://overturemaps-us-west-2/release/2024-09-18.0/theme=places/type=place/*',
+                      filename=false, hive_partitioning=1)
+    WHERE
+    -- Intersection form, so row groups can be skipped on bbox min/max stats
+    bbox.xmax >= ? AND bbox.xmin <= ?
+    AND bbox.ymax >= ? AND bbox.ymin <= ?
+    AND (categories.primary = ?)
+    """
+    with connect_to_duckdb().cursor() as cur:
+        # Arrow-backed columns skip the conversion to Python string objects
+        df_overture=cur.execute(query, [min_x, max_x, min_y, max_y, user_category]).fetch_arrow_table().to_pandas(split_blocks=True, self_destruct=True, types_mapper=pd.ArrowDtype)
+        if len(df_overture) > MAX_POINTS:
+            # Country-scale results: snap to a ~1km grid so the map payload stays small
+            df_overture = cur.execute("""
+            SELECT
+                CASE WHEN count(*) = 1 THEN any_value(name_value)
+                     ELSE count(*) || ' places' END as name_value,
+                avg(lon) as lon, avg(lat) as lat
+            FROM df_overture
+            GROUP BY round(lon, 2), round(lat, 2)
+            """).fetch_arrow_table().to_pandas(split_blocks=True, self_destruct=True, types_mapper=pd.ArrowDtype)
+    return df_overture
+
+def main():
+    # Streamlit page configuration
     st.set_page_config(layout="wide")
     st.title("Search Places in Hong Kong")
-    st.write("""
+    st.text("""
              Overview:
              This web map allows you to search for different types of places in Hong Kong using Overture Places data.
              The underlyding bounding box used in the SQL query is obtained from Nominatim API.
@@ -66,17 +140,13 @@ def main():
 
     # Read the categories CSV file
     try:
-        
-        df_categories = pd.read_csv('data/categories.csv', sep=";", engine='python')
-        
-        # Only need this column
-        df_categories = df_categories[['Category code']]
+        df_categories = load_categories()
 
         # Create an expander to show the categories
         with st.expander("📋Please View Available Categories For Specific Wording Requirements"):
             st.markdown("<p style='color:red;'>Browse through the categories below and copy the desired category value from Overture Maps:</p>", unsafe_allow_html=True)
             st.dataframe(
-                df_categories,
+                df_categories[['Category code']],
                 use_container_width=True,
                 height=300,
                 hide_index=True
@@ -102,7 +172,7 @@ def main():
             
             # Check if the category exists in the CSV
             matching_categories = df_categories[
-                df_categories['Category code'].str.lower().str.contains(user_category_lower, na=False)
+                df_categories['cat_lower'].str.contains(user_category_lower, regex=False, na=False)
             ]
 
             if not matching_categories.empty:
@@ -130,17 +200,8 @@ def main():
 
         # If both category and country (with valid bounding box) are valid, generate the query
         if valid_category and valid_bounding_box:
-            query = f""" 
-            SELECT names,ST_X(geometry) as lon, ST_Y(geometry) as lat
-            FROM read_parquet('s3://overturemaps-us-west-2/release/2024-09-18.0/theme=places/*/*')
-            WHERE
-            bbox.xmin >= {min_x} AND bbox.xmax <={max_x}
-            AND bbox.ymin >= {min_y} AND bbox.ymax <={max_y}
-            AND (categories.primary='{user_category}')
-            """
             st.info(f"🔍 Generating the map for you!")
-            df_overture=con.sql(query).df()
-            df_overture['name_value'] = df_overture['names'].apply(lambda x: x['primary'])
+            df_overture=load_overture_places(user_category, min_x, max_x, min_y, max_y)
             #st.dataframe(df_overture)
 
             layer = pdk.Layer(
@@ -177,7 +238,7 @@ def main():
                 tooltip=tooltip
             )
 
-            st.pydeck_chart(r)
+            components.html(r.to_html(as_string=True), height=500)
 
     except FileNotFoundError:
         st.error("❌ Categories file not found. Please ensure 'categories.csv' is in the correct location.")
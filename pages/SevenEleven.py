@@ -1,23 +1,30 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 import duckdb
+import pandas as pd
 import pydeck as pdk
-import geopandas as gpd
+import json
 
-def geojson_to_gdf(geojson_path):
+@st.cache_data
+def load_geojson(geojson_path):
     """
-    Convert a GeoJSON file to a GeoDataFrame.
+    Load a GeoJSON file as a plain dict. The GeoJsonLayer takes the
+    FeatureCollection as is, so there is no need to go through GeoPandas.
     Parameters:
     - geojson_path (str): Path to the GeoJSON file.
     Returns:
-    - GeoDataFrame: Loaded GeoDataFrame.
+    - dict: The parsed FeatureCollection.
     """
-    gdf = gpd.read_file(geojson_path)
-    return gdf
+    with open(geojson_path) as f:
+        return json.load(f)
 
+@st.cache_resource
 def connect_to_duckdb(db_path ='hk_711.duckdb'):
     """
     Connect to the DuckDB database and load the spatial extension.
+    The connection is shared across sessions and isn't thread-safe, so
+    query through con.cursor().
     Parameters:
     - db_path (str): Path to the DuckDB database.
     Returns:
@@ -26,6 +33,7 @@ def connect_to_duckdb(db_path ='hk_711.duckdb'):
     con = duckdb.connect(database=db_path, read_only=False)
     con.execute("INSTALL spatial;")
     con.execute("LOAD spatial;")
+    con.execute("SET enable_object_cache=true;")
     return con
 
 def main():
@@ -55,21 +63,18 @@ def main():
     # Step 2: Check if a store is selected
     if selected_store:
         # Display selected store name
-        st.write(f"You selected: **{selected_store}**")
-        st.write("### Hold On! Extracting Data For You...")
+        st.markdown(f"You selected: **{selected_store}**\n\n### Hold On! Extracting Data For You...")
 
         if selected_store == "7-Eleven":
             # Query the DuckDB database for 7-Eleven data
-            query = """SELECT * FROM hk_711"""
-            df_point_data = con.sql(query).df()  # Load data into a DataFrame
-
-            # Clean up DataFrame (you can customize this based on actual columns)
-            df_cleaned = df_point_data[['latitude', 'longitude', 'Address']]  # Adjust based on your actual column names
+            query = """SELECT latitude, longitude, Address FROM hk_711"""
+            with con.cursor() as cur:
+                df_point_data = cur.execute(query).fetch_arrow_table().to_pandas(split_blocks=True, self_destruct=True, types_mapper=pd.ArrowDtype)  # Load data into an Arrow-backed DataFrame
 
             # Define the PyDeck layer for store locations (Scatterplot for points)
             layer = pdk.Layer(
                 "ScatterplotLayer",
-                data=df_cleaned,
+                data=df_point_data,
                 get_position=["longitude", "latitude"],
                 get_fill_color=[0, 140, 255, 160],  # Blue color with transparency
                 get_line_color=[0, 0, 0, 255],      # Black border
@@ -108,16 +113,17 @@ def main():
             if show_isochrones:
                 # Dynamically construct the isochrones GeoJSON path based on the selected store name
                 store_filename = selected_store.replace(' ', '_')  # Replace spaces with underscores
-                isochrones_geojson_path = f"data/isochrones_{store_filename}_hongkong.geojson"
+                # Overlapping per-store isochrones are pre-merged by scripts/dissolve_isochrones.py
+                isochrones_geojson_path = f"data/isochrones_{store_filename}_hongkong_dissolved.geojson"
 
                 # Load isochrones data if the checkbox is checked
                 if os.path.exists(isochrones_geojson_path):
-                    gdf_isochrones = geojson_to_gdf(isochrones_geojson_path)
+                    isochrones_geojson = load_geojson(isochrones_geojson_path)
 
                     # Define the PyDeck layer for isochrones
                     isochrones_layer = pdk.Layer(
                         "GeoJsonLayer",
-                        gdf_isochrones,
+                        isochrones_geojson,
                         opacity=0.8,
                         stroked=True,
                         filled=True,
@@ -140,7 +146,7 @@ def main():
                 tooltip=tooltip
             )
 
-            st.pydeck_chart(r)
+            components.html(r.to_html(as_string=True), height=500)
 
         else:
             st.write(f"Sorry, data for {selected_store} is not available yet.")
@@ -0,0 +1,100 @@
+"""
+SQL for the average housing price per lot, shared by the Hong Kong Real Estate
+page and scripts/build_lots_with_avg_price.py so the two can't drift apart.
+"""
+import glob
+import os
+
+# These districts ship as four _lot_partN files
+SPLIT_DISTRICTS = ["North", "Tai_Po", "Yuen_Long"]
+
+
+def lot_paths(sanitized_name, data_dir='data'):
+    """
+    Find a district's lot Parquet files.
+
+    Parameters:
+    - sanitized_name (str): Sanitized district name.
+    - data_dir (str): Directory holding the lot files.
+
+    Returns:
+    - tuple of str: Lot file paths.
+    """
+    if sanitized_name in SPLIT_DISTRICTS:
+        return tuple(sorted(glob.glob(os.path.join(data_dir, f"{sanitized_name}_lot_part*.parquet"))))
+    return (os.path.join(data_dir, f"{sanitized_name}_lot.parquet"),)
+
+
+def lot_select_sql(paths):
+    """
+    SELECT producing (OBJECTID, LOTID, geom) from lot Parquet files, at full resolution.
+    """
+    files = ", ".join(f"'{path}'" for path in paths)
+    return f"""
+    SELECT OBJECTID, LOTID, geometry as geom
+    FROM read_parquet([{files}])
+    """
+
+
+def housing_units_sql(housing_path):
+    """
+    SELECT producing (unit_rate, changes, geom) from a district's housing GeoJSON,
+    with the '--'/'12%' changes text turned into an integer percentage.
+    """
+    return f"""
+    SELECT
+        unit_rate,
+        CASE
+        WHEN changes LIKE '--' THEN 0
+        ELSE CAST(REGEXP_REPLACE(changes, '%', '') AS INT)
+        END AS changes,
+        geom
+    FROM st_read('{housing_path}')
+    """
+
+
+def lots_with_avg_price_sql(lot_relation, housing_relation):
+    """
+    SELECT joining lots with housing units into
+    (OBJECTID, LOTID, geom, avg_unit_price, avg_change_percent).
+
+    Parameters:
+    - lot_relation (str): Table name or parenthesized subquery shaped like lot_select_sql.
+    - housing_relation (str): Table name or parenthesized subquery shaped like housing_units_sql.
+
+    Returns:
+    - str: The SELECT statement.
+    """
+    # Match on the lot bounding box first (a plain range join on doubles),
+    # then run the point-in-polygon test only on the candidates. Averages are
+    # per LOTID (a lot can span several OBJECTIDs), so the per-object sums
+    # and counts are rolled up over a LOTID window
+    return f"""
+    WITH lot AS (
+        SELECT OBJECTID, LOTID, geom,
+            ST_XMin(geom) AS minx, ST_XMax(geom) AS maxx,
+            ST_YMin(geom) AS miny, ST_YMax(geom) AS maxy
+        FROM {lot_relation}
+    ),
+    h AS (
+        SELECT unit_rate, changes, geom, ST_X(geom) AS x, ST_Y(geom) AS y
+        FROM {housing_relation}
+    )
+    SELECT
+        lot.OBJECTID,
+        lot.LOTID,
+        ANY_VALUE(lot.geom) AS geom,
+        COALESCE(SUM(SUM(h.unit_rate)) OVER w / NULLIF(SUM(COUNT(h.unit_rate)) OVER w, 0), 0) AS avg_unit_price,
+        COALESCE(SUM(SUM(h.changes)) OVER w / NULLIF(SUM(COUNT(h.changes)) OVER w, 0), 0) AS avg_change_percent
+    FROM
+        lot
+    LEFT JOIN
+        h
+    ON
+        h.x >= lot.minx AND h.x <= lot.maxx
+        AND h.y >= lot.miny AND h.y <= lot.maxy
+        AND ST_Within(h.geom, lot.geom)
+    GROUP BY
+        lot.OBJECTID, lot.LOTID
+    WINDOW w AS (PARTITION BY lot.LOTID)
+    """
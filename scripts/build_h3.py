@@ -0,0 +1,35 @@
+"""
+Precompute the city-wide H3 aggregation of the Hong Kong Airbnb listings.
+
+The listings CSV is static, so the (h3_string, count) table shown on the
+Airbnb Street Density page is built once here instead of on every page load.
+Run from the repository root:
+
+    python scripts/build_h3.py
+"""
+import h3
+import pandas as pd
+
+LISTINGS_CSV = 'data/hk_listing.csv'
+H3_PARQUET = 'data/hk_listing_h3.parquet'
+H3_RESOLUTION = 9
+
+
+def build_h3_counts(csv_path=LISTINGS_CSV, resolution=H3_RESOLUTION):
+    """
+    Count listings per H3 cell.
+    Parameters:
+    - csv_path (str): Path to the Inside Airbnb listings CSV.
+    - resolution (int): H3 resolution of the cells.
+    Returns:
+    - pandas.DataFrame with columns h3_string and count.
+    """
+    df = pd.read_csv(csv_path, usecols=["latitude", "longitude"])
+    h3_cells = [h3.latlng_to_cell(lat, lon, resolution) for lat, lon in zip(df["latitude"], df["longitude"])]
+    return pd.DataFrame({"h3_string": h3_cells}).groupby("h3_string").size().reset_index(name="count")
+
+
+if __name__ == "__main__":
+    h3_df = build_h3_counts()
+    h3_df.to_parquet(H3_PARQUET, index=False)
+    print(f"Wrote {len(h3_df)} cells to {H3_PARQUET}")
@@ -0,0 +1,18 @@
+"""
+Convert the H3 population distribution CSV to Parquet.
+
+The Hong Kong Population Distribution page reads the typed, columnar
+Parquet file instead of re-parsing the CSV. Run from the repository root:
+
+    python scripts/build_hk_pop_dist.py
+"""
+import pandas as pd
+
+POP_CSV = 'data/hk_pop_dist.csv'
+POP_PARQUET = 'data/hk_pop_dist.parquet'
+
+
+if __name__ == "__main__":
+    df_h3 = pd.read_csv(POP_CSV, usecols=["hex_id", "total_population"])
+    df_h3.to_parquet(POP_PARQUET, index=False)
+    print(f"Wrote {len(df_h3)} cells to {POP_PARQUET}")
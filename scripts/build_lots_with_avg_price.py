@@ -0,0 +1,65 @@
+"""
+Precompute the average housing price per lot for every district.
+
+The 2020-2023 transactions are static, so the lot/housing spatial join behind
+the Hong Kong Real Estate page (real_estate_sql) is run once here and written to
+data/{district}_lots_with_avg_price.parquet. When that file exists the page
+reads it directly instead of running the join. Run from the repository root:
+
+    python scripts/build_lots_with_avg_price.py
+"""
+import os
+import sys
+
+import duckdb
+
+# Run as a script from the repository root; the shared SQL lives there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from real_estate_sql import housing_units_sql, lot_paths, lot_select_sql, lots_with_avg_price_sql
+
+DATA_DIR = 'data'
+DISTRICTS = [
+    "Central_and_Western", "Eastern", "Southern", "Wan_Chai",
+    "Kowloon_City", "Kwun_Tong", "Sham_Shui_Po", "Wong_Tai_Sin",
+    "Yau_Tsim_Mong", "Islands", "Kwai_Tsing", "North", "Sai_Kung",
+    "Sha_Tin", "Tai_Po", "Tsuen_Wan", "Tuen_Mun", "Yuen_Long",
+]
+
+
+def build_district(con, district):
+    """
+    Join one district's lots with its housing transactions and write the result.
+    Parameters:
+    - con: DuckDB connection with spatial loaded.
+    - district (str): Sanitized district name.
+    Returns:
+    - int: Number of lots written, or 0 if the district has no housing data.
+    """
+    housing_path = f"{DATA_DIR}/{district}_hk2020.geojson"
+    if not os.path.exists(housing_path):
+        return 0
+    has_housing = con.execute(
+        "SELECT count(*) FROM (SELECT 1 FROM st_read(?) LIMIT 1)", [housing_path]
+    ).fetchone()[0]
+    if not has_housing:
+        return 0
+
+    out_path = f"{DATA_DIR}/{district}_lots_with_avg_price.parquet"
+    query = lots_with_avg_price_sql(
+        f"({lot_select_sql(lot_paths(district, DATA_DIR))})",
+        f"({housing_units_sql(housing_path)})"
+    )
+    con.execute(f"COPY ({query}) TO '{out_path}' (FORMAT PARQUET, CODEC 'ZSTD', ROW_GROUP_SIZE 5000);")
+    return con.execute("SELECT count(*) FROM read_parquet(?)", [out_path]).fetchone()[0]
+
+
+if __name__ == "__main__":
+    con = duckdb.connect()
+    con.execute("INSTALL spatial;")
+    con.execute("LOAD spatial;")
+    for district in DISTRICTS:
+        n = build_district(con, district)
+        if n:
+            print(f"Wrote {n} lots for {district}")
+        else:
+            print(f"Skipped {district}: no housing data")
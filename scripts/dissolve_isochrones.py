@@ -0,0 +1,20 @@
+"""
+Dissolve the per-store isochrones into one (multi)polygon.
+
+The 7-Eleven page only shades the area within reach of any store, so the
+hundreds of overlapping per-store polygons are merged once here and the map
+draws the union instead. Run from the repository root:
+
+    python scripts/dissolve_isochrones.py
+"""
+import geopandas as gpd
+
+ISOCHRONES_GEOJSON = 'data/isochrones_7-Eleven_hongkong.geojson'
+DISSOLVED_GEOJSON = 'data/isochrones_7-Eleven_hongkong_dissolved.geojson'
+
+
+if __name__ == "__main__":
+    gdf = gpd.read_file(ISOCHRONES_GEOJSON)
+    dissolved = gpd.GeoDataFrame(geometry=[gdf.union_all()], crs=gdf.crs)
+    dissolved.to_file(DISSOLVED_GEOJSON, driver='GeoJSON')
+    print(f"Dissolved {len(gdf)} isochrones into {DISSOLVED_GEOJSON}")
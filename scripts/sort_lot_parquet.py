@@ -0,0 +1,49 @@
+"""
+Write Hilbert-ordered copies of the district lot Parquet files with a bbox column.
+
+Lots that are close on the map end up in the same row groups, and the
+GeoParquet 1.1 covering bbox column gives each row group min/max statistics,
+so a bbox predicate in read_parquet can skip row groups instead of decoding
+every geometry. The sorted copies go to data/hilbert/ (git-ignored); the
+tracked source files are left as they are. Run from the repository root:
+
+    python scripts/sort_lot_parquet.py
+"""
+import glob
+import os
+
+import geopandas as gpd
+
+# Lot files only; not the *_lots_with_avg_price side tables
+LOT_GLOBS = ['data/*_lot.parquet', 'data/*_lot_part*.parquet']
+OUT_DIR = 'data/hilbert'
+ROW_GROUP_SIZE = 8000
+
+
+def sort_lot_file(path, out_path, row_group_size=ROW_GROUP_SIZE):
+    """
+    Sort one lot file along a Hilbert curve and write the result to out_path.
+    Parameters:
+    - path (str): Path to a {district}_lot[_partN].parquet file.
+    - out_path (str): Where to write the sorted copy.
+    - row_group_size (int): Rows per Parquet row group.
+    Returns:
+    - int: Number of lots written.
+    """
+    gdf = gpd.read_parquet(path)
+    gdf = gdf.iloc[gdf.hilbert_distance().argsort()]
+    gdf.to_parquet(
+        out_path,
+        index=False,
+        compression='zstd',
+        row_group_size=row_group_size,
+        write_covering_bbox=True
+    )
+    return len(gdf)
+
+
+if __name__ == "__main__":
+    os.makedirs(OUT_DIR, exist_ok=True)
+    for path in sorted(p for pattern in LOT_GLOBS for p in glob.glob(pattern)):
+        out_path = os.path.join(OUT_DIR, os.path.basename(path))
+        print(f"Wrote {sort_lot_file(path, out_path)} lots to {out_path}")